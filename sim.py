@@ -19,7 +19,10 @@
     02110-1301, USA.
 '''
 import logging
+from optparse import OptionParser
 from myhdl import (
+    block,
+    instance as block_instance,
     delay,
     always,
     now,
@@ -36,6 +39,18 @@ from myhdl import (
 ##import parallel
 
 
+# The bit loops run range() on every call, so under Python 2 use xrange
+# rather than build a list each time.
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+# The programmer's commands are plain generators that get yielded to the
+# scheduler, so this just calls the function.  Processes returned from a
+# @block use MyHDL's own instance (block_instance) so traceSignals can
+# find them.
 def instance(function):
     return function()
 
@@ -44,13 +59,19 @@ logging.basicConfig(format='%(message)s', level=logging.DEBUG)
 log = logging.getLogger()
 
 
-_onoff = lambda n: ('off', 'on')[bool(n)]
+# Set this to True (or call setDebug() on a Programmer) to report the
+# programmer's progress through its commands.
+_DEBUG = False
+
+
+# Indexed by the (bool) clock level.
+_ONOFF = ('off', 'on')
 
 
 # When we send data to the chip, we want to send a zero start bit and
 # stop bit.  To do this, we accept 8- or 14-bit data value, shift it one
-# bit left and AND it with the SIXTEEN_BITS "constant".
-SIXTEEN_BITS = intbv(0)[16:]
+# bit left and mask it to sixteen bits with the _FRAME_MASK constant.
+_FRAME_MASK = 0xFFFF
 
 
 # These two state enums are used by the lowlevel and midlevel api mixins
@@ -83,104 +104,132 @@ OSCCAL_ADDRESS = 3 # Real value = 0x3ff
 OSCCAL_MASK = intbv(int('11110000000000', 2))[14:]
 RETLW_MASK = intbv(int('11010000000000', 2))[14:]
 
+# Loaded with the LoadConfiguration command to reach the ID words.
+_ZERO14 = intbv(0)[14:]
+
+
+# The values that must be read from the chip (and saved) before it can be
+# bulk erased, and the bits that flag them as read in _ready_flags.
+_OSCCAL_READY, _ID_READY, _BG_READY = 1, 2, 4
+_ALL_READY = _OSCCAL_READY | _ID_READY | _BG_READY
+_READY_FLAGS = (
+    ('OSCCAL', _OSCCAL_READY),
+    ('ID', _ID_READY),
+    ('BG', _BG_READY),
+    )
+
 
 class InvalidOSCCALError(Exception): pass
 class FaultyWriteError(Exception): pass
 
 
 # Now we need the actual bit patterns of the various commands in the form
-# of intbv instances.  To make these conveniently, I made this little
+# of 6-bit ints.  To make these conveniently, I made this little
 # _command() function.
 
 def _command(pattern):
     '''
-    Convert a bit pattern string into an intbv.
+    Convert a bit pattern string into an int.  "Don't care" bits (X) are
+    sent as zero.
     '''
-    res = intbv(0)[6:]
-    for i, bit in enumerate(reversed(pattern.split())):
-        if bit == '1':
-            res[i] = True
-    return res
+    bits = pattern.replace(' ', '').replace('X', '0')
+    assert len(bits) == 6, pattern
+    return int(bits, 2)
 
 
 def _print_commands():
     '''
     Debugging aid to print out the programmer commands defined below.
     '''
-    for n, obj in globals().iteritems():
-        if isinstance(obj, intbv):
-            print '%s = %s' % (n, bin(obj, 6))
+    for name, _ in _COMMANDS:
+        print('%s = %s' % (name, bin(globals()[name], 6)))
+
+# And here they are, the basic commands to program the PIC 12F675, as
+# (name, bit pattern) pairs.  Each one is made into a module-level
+# constant of that name below.
+_COMMANDS = (
 
-# And here they are, the basic commands to program the PIC 12F675.
+    # Command and 14 bits of data
+    ('LoadConfiguration',        'X X 0 0 0 0'),
+    ('LoadDataforProgramMemory', 'X X 0 0 1 0'),
 
-# Command and 14 bits of data
-LoadConfiguration        = _command('X X 0 0 0 0')
-LoadDataforProgramMemory = _command('X X 0 0 1 0')
+    # No data bits.
+    ('IncrementAddress', 'X X 0 1 1 0'),
+    ('EndProgramming',   '0 0 1 0 1 0'),
 
-# No data bits.
-IncrementAddress = _command('X X 0 1 1 0')
-EndProgramming   = _command('0 0 1 0 1 0')
+    # Command and 8 bits of data
+    ('LoadDataforDataMemory', 'X X 0 0 1 1'),
 
-# Command and 8 bits of data
-LoadDataforDataMemory = _command('X X 0 0 1 1')
+    # Read 14 and 8 bits, respectively, from the port.
+    ('ReadDatafromProgramMemory', 'X X 0 1 0 0'),
+    ('ReadDatafromDataMemory',    'X X 0 1 0 1'),
 
-# Read 14 and 8 bits, respectively, from the port.
-ReadDatafromProgramMemory = _command('X X 0 1 0 0')
-ReadDatafromDataMemory    = _command('X X 0 1 0 1')
+    # Require Tprog.
+    ('BeginProgrammingInternallyTimed', '0 0 1 0 0 0'),
+    ('BeginProgrammingExternallyTimed', '0 1 1 0 0 0'),
 
-# Require Tprog.
-BeginProgrammingInternallyTimed = _command('0 0 1 0 0 0')
-BeginProgrammingExternallyTimed = _command('0 1 1 0 0 0')
+    # Require Terase.
+    ('BulkEraseProgramMemory', 'X X 1 0 0 1'),
+    ('BulkEraseDataMemory',    'X X 1 0 1 1'),
+
+    )
 
-# Require Terase.
-BulkEraseProgramMemory = _command('X X 1 0 0 1')
-BulkEraseDataMemory    = _command('X X 1 0 1 1')
+for _name, _pattern in _COMMANDS:
+    globals()[_name] = _command(_pattern)
+del _name, _pattern
 
 
 def _bus2int(bus):
-    res = sum(1 << n for n, line in enumerate(reversed(bus)) if line.val)
-    return res
+    # The bus is always four lines wide, MSB first, so unroll it.
+    return (
+        bus[0].val << 3 |
+        bus[1].val << 2 |
+        bus[2].val << 1 |
+        bus[3].val
+        )
 
 
-def ClockDriver(clock):
+@block
+def ClockDriver(clock, STROBE_BIT, strobe_enable):
+    '''
+    Drive the sim clock, and the chip strobe from it: the strobe follows
+    the clock high while strobe_enable is set and always goes low with it.
+    '''
     log.info('P+DS\t\t\t%s\tclock', str(now()))
 
+    # This runs on every edge, so decide once up front whether to trace.
+    trace = log.isEnabledFor(logging.INFO)
+
     @always(delay(10))
     def driveClk():
         next = not clock
-        log.info('\t\t\t%s\t%s', str(now()), _onoff(next))
+        if trace:
+            log.info('\t\t\t%s\t%s', now(), _ONOFF[next])
         clock.next = next
+        STROBE_BIT.next = next and strobe_enable.val
 
     return driveClk
 
 
-def StrobeClockLink(clock, STROBE_BIT, strobe_enable):
-    '''Drive the chip strobe from the sim clock.'''
+@block
+def PortDriver(bus):
 
-    @instance
-    def clock_link():
+    @block_instance
+    def drive_port():
         while True:
-            yield clock.posedge
-            STROBE_BIT.next = strobe_enable and True
-            yield clock.negedge
-            STROBE_BIT.next = False
-
-    return clock_link
-
-
-def PortDriver(clock, bus):
-    prev = [-1]
+            send(_bus2int(bus))
 
-    @always(clock.posedge, clock.negedge)
-    def drive_port():
-        b = _bus2int(bus)
-        if b != prev[0]:
-            prev[0] = b
-            send(b)
+            # Sleep until a line on the bus changes.  The strobe changes
+            # along with the clock, but the data line is set by blocks
+            # waiting on the strobe, so let the rest of this time step
+            # settle before sampling the bus again.
+            yield bus
+            yield delay(0)
 
     return drive_port
 
 
+@block
 def initialize(
     clock,
     STROBE_BIT,
@@ -190,12 +239,8 @@ def initialize(
     strobe_enable
     ):
     return (
-        ClockDriver(clock),
-        StrobeClockLink(clock, STROBE_BIT, strobe_enable),
-        PortDriver(
-            clock,
-            (PROGRAM_BIT, POWER_BIT, DATA_BIT, STROBE_BIT)
-            )
+        ClockDriver(clock, STROBE_BIT, strobe_enable),
+        PortDriver((PROGRAM_BIT, POWER_BIT, DATA_BIT, STROBE_BIT)),
         )
 
 
@@ -205,7 +250,27 @@ def initialize(
 # turns off the chip strobe and brings the data line low to support
 # internally timed "wait states" such as when erasing the memories.
 
-class LowerController:
+class LowerController(object):
+
+    # The programmer's attributes are read on every bit sent or received,
+    # so keep them in slots.  Since Programmer mixes the classes below in
+    # with this one, this is also where the slots for the attributes they
+    # set live (the mixins themselves declare empty __slots__.)
+    __slots__ = (
+        'clock',
+        'state',
+        'mstate',
+        'STROBE_BIT',
+        'DATA_BIT',
+        'POWER_BIT',
+        'PROGRAM_BIT',
+        'strobe_enable',
+        'res_int',
+        'OSCCAL',
+        'ID',
+        'BG',
+        '_ready_flags',
+        )
 
     def __init__(self,
         clock,
@@ -225,48 +290,55 @@ class LowerController:
         self.POWER_BIT = POWER_BIT
         self.PROGRAM_BIT = PROGRAM_BIT
         self.strobe_enable = strobe_enable
+        self._ready_flags = 0
 
-    def sendBits(self, bits):
+    def sendBits(self, value, number_of_bits):
         '''
-        Send the bits, LSB (index -1) to MSB (index 0) serial-ly over the
-        wire.
+        Send the number_of_bits lowest bits of the int value, LSB to MSB,
+        serial-ly over the wire.
         '''
-        # Iteration is wonky on intbv's.
-        C = reversed(list(bits))
+        # These are used for every bit, so only look them up once.
+        strobe, data = self.STROBE_BIT, self.DATA_BIT
 
         # Set the first bit on the data line and the lowlevel state.
-        yield self.STROBE_BIT.posedge
+        yield strobe.posedge
         self.state.next = LOW_LEVEL.Tx
-        self.DATA_BIT.next = C.next()
+        data.next = value & 1
 
         # Send the rest of the data bits.
-        for bit in C:
-            yield self.STROBE_BIT.posedge
-            self.DATA_BIT.next = bit
+        for _ in range(number_of_bits - 1):
+            value >>= 1
+            yield strobe.posedge
+            data.next = value & 1
 
     def readBits(self, number_of_bits):
         '''
-        Reads number_of_bits bits from the wire, and puts a list of bits,
-        LSB to MSB, into the LowerController instance's 'res' attribute.
+        Reads number_of_bits bits from the wire, LSB to MSB, and puts
+        their int value into the LowerController instance's 'res_int'
+        attribute.
         '''
 
+        # These are used for every bit, so only look them up once.
+        strobe, data = self.STROBE_BIT, self.DATA_BIT
+        read = self._read
+
         # Set the state,
-        yield self.STROBE_BIT.posedge
+        yield strobe.posedge
         self.state.next = LOW_LEVEL.Rx
 
         # Accumulate the requested number_of_bits.
-        res = []
-        for _ in range(number_of_bits):
+        res = 0
+        for n in range(number_of_bits):
 
             # Read on the negative edge.
-            yield self.STROBE_BIT.negedge
+            yield strobe.negedge
 
             # We also put the bit into the data line in order to see it
             # on the GTKWave traces.
-            bit = self.DATA_BIT.next = self._read()
-            res.append(bit)
+            bit = data.next = read()
+            res |= bit << n
 
-        self.res = res
+        self.res_int = res
 
     def rest(self, cycles=1):
         '''
@@ -275,21 +347,26 @@ class LowerController:
         if cycles < 1:
             return
 
-        self.strobe_enable.next = False
-        yield self.clock.posedge
+        clock, state = self.clock, self.state
+        strobe_enable = self.strobe_enable
 
-        self.state.next = LOW_LEVEL.REST
+        strobe_enable.next = False
+        yield clock.posedge
+
+        state.next = LOW_LEVEL.REST
         self.DATA_BIT.next = False
         cycles -= 1
-        yield self.clock.negedge
+        yield clock.negedge
 
-        while self.state == LOW_LEVEL.REST and cycles:
-            yield self.clock.posedge
+        while state == LOW_LEVEL.REST and cycles:
+            yield clock.posedge
             cycles -= 1
 
-        self.strobe_enable.next = True
+        strobe_enable.next = True
 
     def _read(self):
+        # In the simulation the chip's answer is whatever is on the data
+        # line; talking to real hardware this would read the port.
         return self.DATA_BIT.val
 
 
@@ -299,84 +376,76 @@ class LowerController:
 # The next stage of the programmer api makes these command types out of
 # the lowlevel api above.  As you'll see, they are very basic.
 
-class ProgrammingCommandTypesMixin:
+class ProgrammingCommandTypesMixin(object):
     '''
     Implements the low-level programmer commands on top of the "api"
     exposed by the LowerController.
     '''
 
+    __slots__ = ()
+
     def sendCommandAndData(self, cmd, data):
-        assert cmd.max == 64
         assert data.max == 16384
 
         # Add start and stop bits.
-        data = (data << 1 | SIXTEEN_BITS)[16:]
+        data = (int(data) << 1) & _FRAME_MASK
 
-        @instance
-        def sender():
-            yield self.sendBits(cmd)
-            yield self.sendBits(data)
-        return sender
+        return self._sendCommandAndData(cmd, data)
 
     def sendCommandAndByteData(self, cmd, data):
-        assert cmd.max == 64
         assert data.max == 256
 
         # Add start, stop and pad bits.
-        data = (data << 1 | SIXTEEN_BITS)[16:]
+        data = (int(data) << 1) & _FRAME_MASK
 
-        @instance
-        def sender():
-            yield self.sendBits(cmd)
-            yield self.sendBits(data)
-        return sender
+        return self._sendCommandAndData(cmd, data)
 
     def sendCommand(self, cmd):
-        assert cmd.max == 64
-        @instance
-        def sender():
-            yield self.sendBits(cmd)
-        return sender
+        return self.sendBits(cmd, 6)
 
-    def sendCommandAndReadData(self, cmd, output):
-        assert cmd.max == 64
+    def Tprog(self):
+        return self.rest(3)
 
-        @instance
-        def sender():
-            yield self.sendBits(cmd)
-            yield self.readBits(16)
-            res = self.res
-            assert not (res[0] or res[15])
+    # In the simulation Terase is the same three cycle rest as Tprog.
+    Terase = Tprog
 
-            N = sum(1 << n for n, bit in enumerate(res[1:-1]) if bit)
-            output.append(N)
-        return sender
+    def sendCommandAndReadData(self, cmd, output):
+        return self._sendCommandAndRead(cmd, output, 14)
 
     def sendCommandAndReadByteData(self, cmd, output):
-        assert cmd.max == 64
+        return self._sendCommandAndRead(cmd, output, 8)
 
-        @instance
-        def sender():
-            yield self.sendBits(cmd)
-            yield self.readBits(16)
-            res = self.res
-            assert not (res[0] or res[15])
+    # The rest of the command types are plain generator methods, so that
+    # issuing a command doesn't have to define and decorate a new block
+    # function each time.
 
-            N = sum(1 << n for n, bit in enumerate(res[1:-7]) if bit)
-            output.append(N)
-        return sender
+    def sendCommandAndWait(self, cmd, wait):
+        yield self.sendBits(cmd, 6)
+        yield wait()
 
-    def Tprog(self):
-        @instance
-        def sender():
-            yield self.rest(3)
-        return sender
+    def _sendCommandAndData(self, cmd, data):
+        yield self.sendBits(cmd, 6)
+        yield self.sendBits(data, 16)
 
-    def Terase(self):
-        @instance
-        def sender():
-            yield self.rest(3)
-        return sender
+    def _sendCommandAndRead(self, cmd, output, number_of_bits):
+        yield self.sendBits(cmd, 6)
+        yield self.readBits(16)
+
+        # Check the start and stop bits, then drop them (and any pad.)
+        res = self.res_int
+        assert not res & 0x8001
+        output.append((res >> 1) & ((1 << number_of_bits) - 1))
+
+
+def _state_change(programmer, label):
+    '''
+    A "state-changer" block that sets the programmer's midlevel state to
+    the label state on the next clock.
+    '''
+    yield programmer.clock.posedge
+    programmer.mstate.next = label
+    if _DEBUG:
+        log.debug('%s', label)
 
 
 def metaD(label):
@@ -395,12 +464,14 @@ def metaD(label):
             # Get the wrapped method's blocks.
             blocks = func(self, *a, **b)
 
+            # If we're already in the label state (e.g. a run of IncrAddr
+            # commands) there's nothing to change, so don't bother with
+            # the extra block.
+            if self.mstate == label:
+                return blocks
+
             # Create a new "state-changer" block.
-            @instance
-            def state_change():
-                yield self.clock.posedge
-                self.mstate.next = label
-                print label
+            state_change = _state_change(self, label)
 
             # Let them run in parallel.  (We must use join() rather than
             # just returning both in order that the "outer" command, the
@@ -425,11 +496,13 @@ def metaD(label):
 # layers of the api.  Most of the commands below are one-liners (two-
 # liners if you count the metadecorator invocations.
 
-class ProgrammingCommandsMixin:
+class ProgrammingCommandsMixin(object):
     '''
     Maps the programmer commands onto the lower-level command "types".
     '''
 
+    __slots__ = ()
+
     @metaD(MID_LEVEL.LC)
     def LoadConf(self, data):
         return self.sendCommandAndData(LoadConfiguration, data)
@@ -446,6 +519,14 @@ class ProgrammingCommandsMixin:
     def IncrAddr(self):
         return self.sendCommand(IncrementAddress)
 
+    @metaD(MID_LEVEL.Incr)
+    def IncrAddrBy(self, n):
+        '''
+        Increment the address n times under a single state change.
+        '''
+        for _ in range(n):
+            yield self.sendCommand(IncrementAddress)
+
     @metaD(MID_LEVEL.EOP)
     def EOP(self):
         return self.sendCommand(EndProgramming)
@@ -460,36 +541,37 @@ class ProgrammingCommandsMixin:
 
     @metaD(MID_LEVEL.BP)
     def BeginProg(self):
-        @instance
-        def beginprog():
-            yield self.sendCommand(BeginProgrammingInternallyTimed)
-            yield self.Tprog()
-        return beginprog
+        return self.sendCommandAndWait(
+            BeginProgrammingInternallyTimed,
+            self.Tprog
+            )
 
     @metaD(MID_LEVEL.EP)
     def EraseProg(self):
-        @instance
-        def eraseprog():
-            yield self.sendCommand(BulkEraseProgramMemory)
-            yield self.Terase()
-        return eraseprog
+        return self.sendCommandAndWait(BulkEraseProgramMemory, self.Terase)
 
     @metaD(MID_LEVEL.ED)
     def EraseData(self):
-        @instance
-        def erasedata():
-            yield self.sendCommand(BulkEraseDataMemory)
-            yield self.Terase()
-        return erasedata
+        return self.sendCommandAndWait(BulkEraseDataMemory, self.Terase)
+
+
+class MetaCommands(object):
 
+    __slots__ = ()
 
-class MetaCommands:
+    def setDebug(self, flag=True):
+        '''
+        Turn reporting of the programmer's progress on or off.
+        '''
+        global _DEBUG
+        _DEBUG = flag
 
     def start(self):
         @instance
         def FireItUp():
 
-            print 'STARTUP COMMENCING'
+            if _DEBUG:
+                print('STARTUP COMMENCING')
 
             # Reset the bus.
             self.STROBE_BIT.next = False
@@ -512,14 +594,16 @@ class MetaCommands:
             # Activate the chip strobe.
             yield self.clock.posedge
             self.strobe_enable.next = True
-            print 'STARTUP FINISHED'
+            if _DEBUG:
+                print('STARTUP FINISHED')
         return FireItUp
 
     def shutdown(self):
         @instance
         def ShutErDown():
 
-            print 'SHUTDOWN COMMENCING'
+            if _DEBUG:
+                print('SHUTDOWN COMMENCING')
 
             yield self.clock.posedge
 
@@ -539,32 +623,85 @@ class MetaCommands:
             self.POWER_BIT.next = False
 
             yield self.clock.posedge
-            print 'SHUTDOWN FINISHED'
+            if _DEBUG:
+                print('SHUTDOWN FINISHED')
         return ShutErDown
 
     def reset(self):
+        '''
+        Power cycle the chip into programmer mode.  This is shutdown()
+        followed by start(), run as one block and without their
+        redundant steps: the bus is already low when the power goes off,
+        and the state vars only need setting once.
+        '''
         @instance
         def Resetter():
-            print 'RESET COMMENCING'
-            yield self.shutdown()
-            yield self.start()
-            print 'RESET FINISHED'
+            if _DEBUG:
+                print('RESET COMMENCING')
+
+            yield self.clock.posedge
+
+            # Set the state vars.
+            self.state.next = LOW_LEVEL.REST
+            self.mstate.next = MID_LEVEL.naught
+
+            self.DATA_BIT.next = False
+            self.strobe_enable.next = False
+
+            # Deactivate programmer mode.
+            yield self.clock.posedge
+            self.PROGRAM_BIT.next = False
+
+            # Reset the power.
+            yield self.clock.posedge
+            self.POWER_BIT.next = False
+
+            # Activate programmer mode.
+            yield self.clock.posedge
+            self.PROGRAM_BIT.next = True
+
+            # Turn on the chip.
+            yield self.clock.posedge
+            self.POWER_BIT.next = True
+
+            # Activate the chip strobe.
+            yield self.clock.posedge
+            self.strobe_enable.next = True
+
+            if _DEBUG:
+                print('RESET FINISHED')
         return Resetter
 
     def programCycle(self, data):
-        @instance
-        def block():
-            yield self.LoadProg(data)
-            yield self.BeginProg()
+        return self.programImage((data,))
 
-            output = []
-            yield self.ReadProg(output)
-            if output[0] != data:
+    @metaD(MID_LEVEL.LP)
+    def programImage(self, words):
+        '''
+        Program each of the words in turn at the current address, reading
+        each one back to verify it before incrementing the address.
+
+        The commands are issued through the command types directly, so
+        programming a whole image doesn't cost a metaD state-changer and
+        join() per command.  The midlevel state shows LP for the whole
+        run.
+        '''
+        output = []
+        for data in words:
+            yield self.sendCommandAndData(LoadDataforProgramMemory, data)
+            yield self.sendCommandAndWait(
+                BeginProgrammingInternallyTimed,
+                self.Tprog
+                )
+
+            yield self.sendCommandAndReadData(
+                ReadDatafromProgramMemory,
+                output
+                )
+            if output.pop() != data:
                 raise FaultyWriteError
 
-            yield self.IncrAddr()
-
-        return block
+            yield self.sendCommand(IncrementAddress)
 
     def readOSCCAL(self):
         @instance
@@ -573,8 +710,7 @@ class MetaCommands:
 
             yield self.reset()
 
-            for _ in xrange(OSCCAL_ADDRESS):
-                yield self.IncrAddr()
+            yield self.IncrAddrBy(OSCCAL_ADDRESS)
 
             yield self.ReadProg(output)
 
@@ -584,6 +720,7 @@ class MetaCommands:
     ##            raise InvalidOSCCALError
 
             self.OSCCAL = OSCCAL
+            self._ready_flags |= _OSCCAL_READY
 
         return block
 
@@ -594,30 +731,37 @@ class MetaCommands:
 
             yield self.reset()
 
-            yield self.LoadConf(intbv(0)[14:])
-
-            for _ in range(4):
-                yield self.ReadProg(output)
-                yield self.IncrAddr()
+            yield self.LoadConf(_ZERO14)
 
-            for _ in range(3):
-                yield self.IncrAddr()
+            # Read the four ID words at 0x2000 - 0x2003...
+            yield self.ReadProg(output)
+            yield self.IncrAddr()
+            yield self.ReadProg(output)
+            yield self.IncrAddr()
+            yield self.ReadProg(output)
+            yield self.IncrAddr()
+            yield self.ReadProg(output)
+            yield self.IncrAddr()
 
+            # ...then skip ahead to the config word at 0x2007.
+            yield self.IncrAddrBy(3)
             yield self.ReadProg(output)
 
             ID, BG = tuple(output[:4]), output[-1]
 
             self.ID = ID
             self.BG = BG
+            self._ready_flags |= _ID_READY | _BG_READY
 
         return block
 
     def bulkEraseDevice(self):
         @instance
         def block():
-            for attr in ('OSCCAL', 'ID', 'BG'):
-                if not hasattr(self, attr):
-                    raise Exception('aw %s' % repr(attr))
+            if self._ready_flags != _ALL_READY:
+                for attr, flag in _READY_FLAGS:
+                    if not self._ready_flags & flag:
+                        raise Exception('aw %s' % repr(attr))
             yield self.EraseProg()
             yield self.EraseData()
         return block
@@ -637,15 +781,21 @@ class Programmer(
     ProgrammingCommandsMixin,
     MetaCommands
     ):
-    pass
+    __slots__ = ()
+
+
+# The port is four bits wide, so the log strings for every value it can
+# be sent are made up front.
+_NIBBLES = tuple(bin(n, 4) for n in range(16))
 
 
 def send(data):
     '''sends data to a parallel port.'''
-    data = intbv(data)[4:]
-    log.info('%s sent\t\t%s' % (bin(data, 4), str(now())))
+    if log.isEnabledFor(logging.INFO):
+        log.info('%s sent\t\t%s', _NIBBLES[data & 0xF], now())
 
 
+@block
 def main():
     (
         STROBE_BIT,
@@ -656,7 +806,7 @@ def main():
         clock,
         strobe_enable,
 
-    ) = [Signal(False) for _ in range(6)]
+    ) = (Signal(False) for _ in range(6))
 
     state = Signal(LOW_LEVEL.REST)
     mstate = Signal(MID_LEVEL.naught)
@@ -681,7 +831,7 @@ def main():
         strobe_enable,
         )
 
-    @instance
+    @block_instance
     def Program():
         yield programmer.cleanDevice()
         yield programmer.shutdown()
@@ -691,8 +841,18 @@ def main():
 
 
 if __name__ == '__main__':
-#    ts = traceSignals(main)
-#    sim = Simulation(ts)
-
-    sim = Simulation(main())
+    parser = OptionParser()
+    parser.add_option('--trace', action='store_true', default=False,
+        help='write a VCD trace of the signals for GTKWave')
+    parser.add_option('--debug', action='store_true', default=False,
+        help="report the programmer's progress through its commands")
+    options, args = parser.parse_args()
+    _DEBUG = options.debug
+
+    # Tracing writes every signal change to the VCD file, so only do it
+    # when asked to.
+    if options.trace:
+        sim = Simulation(traceSignals(main()))
+    else:
+        sim = Simulation(main())
     sim.run()